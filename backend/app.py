@@ -1,21 +1,45 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from flask_compress import Compress
+from flask_orjson import OrjsonProvider
 from msal import ConfidentialClientApplication
 import os
+import re
 from dotenv import load_dotenv
-import json
+import orjson
 from pathlib import Path
 import uuid
-from threading import Lock
-from typing import Tuple
+import atexit
+import queue
+import functools
+import concurrent.futures
+from datetime import datetime
+from threading import Lock, Thread
+import time
+import gzip
+from typing import Dict, Optional, Tuple
 from cryptography.fernet import Fernet, InvalidToken
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import ijson
+try:
+    import brotlicffi as brotli
+except ImportError:
+    import brotli
 
 load_dotenv()
 
 app = Flask(__name__)
-# CORS configuration to handle any localhost port
-CORS(app, origins=["http://localhost:8080", "http://localhost:8081", "http://localhost:8082", "http://localhost:8083", "http://localhost:8084", "http://localhost:8085", "http://localhost:8086", "http://localhost:8087", "http://localhost:8088", "http://localhost:8089", "http://localhost:8090", "http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:8080", "http://127.0.0.1:8081", "http://127.0.0.1:8082", "http://127.0.0.1:8083", "http://127.0.0.1:8084", "http://127.0.0.1:8085", "http://127.0.0.1:8086", "http://127.0.0.1:8087", "http://127.0.0.1:8088", "http://127.0.0.1:8089", "http://127.0.0.1:8090", "http://127.0.0.1:5173", "http://127.0.0.1:3000"], supports_credentials=True)
+# Serialize jsonify() responses with orjson; the tenant data payloads are large
+app.json = OrjsonProvider(app)
+# Compress JSON responses (Brotli preferred, gzip fallback) when the client accepts it
+app.config['COMPRESS_MIN_SIZE'] = 2048
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+Compress(app)
+# CORS for the local frontend dev ports (8080-8090, 5173, 3000) on localhost/127.0.0.1
+_CORS_ORIGINS = re.compile(r"^http://(?:localhost|127\.0\.0\.1):(?:3000|5173|808[0-9]|8090)$", re.IGNORECASE)
+CORS(app, origins=_CORS_ORIGINS, supports_credentials=True)
 
 # Simple file-backed storage for tenant configurations
 _TENANTS_FILE = Path(__file__).parent / "tenants.json"
@@ -41,35 +65,217 @@ def _encrypt_secret(plain: str) -> str:
     token = _FERNET.encrypt(plain.encode("utf-8"))
     return token.decode("utf-8")
 
+# Every Fernet token starts with this (version byte 0x80 + timestamp, base64url)
+_ENC_PREFIX = "gAAAA"
+
 def _looks_encrypted(value: str) -> bool:
-    return isinstance(value, str) and value.startswith("gAAAA") and len(value) > 20
+    return isinstance(value, str) and value.startswith(_ENC_PREFIX) and len(value) > 20
+
+# Parsed tenants.json, keyed by the file's (mtime_ns, size) so it is only re-parsed
+# when the file changes on disk. by_id maps tenant id -> position in list and
+# redacted is the secret-free view served by GET /api/tenants. gen counts changes
+# made in memory and written is the last gen flushed to disk by the writer thread.
+_TENANTS_CACHE = {"key": None, "list": [], "by_id": {}, "redacted": [], "gen": 0, "written": 0}
+
+def _stat_key() -> tuple:
+    st = _TENANTS_FILE.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+def _redact(t: dict) -> dict:
+    # Do not return secrets; expose hasSecret flag
+    item = {k: v for k, v in t.items() if k != "clientSecret"}
+    item["hasSecret"] = bool(t.get("clientSecret"))
+    return item
+
+def _cache_tenants(key, tenants: list) -> None:
+    # Caller must hold _TENANTS_LOCK
+    _TENANTS_CACHE["key"] = key
+    _TENANTS_CACHE["list"] = tenants
+    _TENANTS_CACHE["by_id"] = {t.get("id"): idx for idx, t in enumerate(tenants)}
+    _TENANTS_CACHE["redacted"] = [_redact(t) for t in tenants]
+
+def _migrate_secrets(tenants: list) -> bool:
+    """Encrypt any plaintext secrets in place; returns True if anything changed.
+
+    Only runs when tenants.json is (re-)parsed: records written through this API are
+    always encrypted already, so the cached list never needs migrating again.
+    """
+    changed = False
+    for t in tenants:
+        secret = t.get("clientSecret")
+        if isinstance(secret, str) and secret and not _looks_encrypted(secret):
+            t["clientSecret"] = _encrypt_secret(secret)
+            changed = True
+    return changed
+
+def _cached_tenants() -> list:
+    """Return the cached tenant list, re-parsing tenants.json if it changed.
+
+    Caller must hold _TENANTS_LOCK and must not mutate the returned records.
+    """
+    if _TENANTS_CACHE["gen"] != _TENANTS_CACHE["written"]:
+        # Changes are still queued for the writer; memory is ahead of the file
+        return _TENANTS_CACHE["list"]
+    if not _TENANTS_FILE.exists():
+        _cache_tenants(None, [])
+        return []
+    key = _stat_key()
+    if key != _TENANTS_CACHE["key"]:
+        tenants = orjson.loads(_TENANTS_FILE.read_bytes())
+        migrated = _migrate_secrets(tenants)
+        _cache_tenants(key, tenants)
+        if migrated:
+            # Persist the encrypted secrets
+            _queue_tenants_write()
+    return _TENANTS_CACHE["list"]
+
+def _load_tenants() -> Tuple[list, dict]:
+    """Return copies of all tenant records and the id -> list position index.
+
+    The index is shared with the cache and must not be mutated.
+    """
+    with _TENANTS_LOCK:
+        try:
+            tenants = _cached_tenants()
+            # Callers mutate the records they get back, so hand out copies
+            return [dict(t) for t in tenants], _TENANTS_CACHE["by_id"]
+        except Exception:
+            return [], {}
 
 def _read_tenants() -> list:
+    return _load_tenants()[0]
+
+def _read_redacted_tenants() -> list:
+    """Return the cached secret-free tenant list; it is shared, so do not mutate it"""
     with _TENANTS_LOCK:
-        if not _TENANTS_FILE.exists():
-            return []
         try:
-            tenants = json.loads(_TENANTS_FILE.read_text(encoding="utf-8"))
-            # Migrate any plaintext secrets to encrypted form
-            changed = False
-            for t in tenants:
-                secret = t.get("clientSecret")
-                if isinstance(secret, str) and secret and not _looks_encrypted(secret):
-                    t["clientSecret"] = _encrypt_secret(secret)
-                    changed = True
-            if changed:
-                _TENANTS_FILE.write_text(json.dumps(tenants, ensure_ascii=False, indent=2), encoding="utf-8")
-            return tenants
+            _cached_tenants()
+            return _TENANTS_CACHE["redacted"]
         except Exception:
             return []
 
+def _get_tenant(tenant_id: str) -> Optional[dict]:
+    """Return a copy of a single tenant record, or None if it does not exist"""
+    with _TENANTS_LOCK:
+        try:
+            tenants = _cached_tenants()
+            idx = _TENANTS_CACHE["by_id"].get(tenant_id)
+            return dict(tenants[idx]) if idx is not None else None
+        except Exception:
+            return None
+
 def _write_tenants(tenants: list) -> None:
+    """Replace the cached tenant list and queue it to be written to tenants.json"""
     with _TENANTS_LOCK:
-        _TENANTS_FILE.write_text(json.dumps(tenants, ensure_ascii=False, indent=2), encoding="utf-8")
+        _cache_tenants(_TENANTS_CACHE["key"], [dict(t) for t in tenants])
+        _queue_tenants_write()
+
+# Writes to tenants.json happen on a single background thread. Each change bumps
+# the cache gen and queues a signal; the writer drains every pending signal and
+# writes the latest list once, so bursts of updates (e.g. concurrent syncs) collapse
+# into one file write.
+_WRITE_QUEUE: "queue.Queue[None]" = queue.Queue()
+_WRITE_LOCK = Lock()
+_WRITER: Optional[Thread] = None
+# Backoff between retries of a failed write, doubling up to the max
+_WRITE_RETRY_S = 0.5
+_WRITE_RETRY_MAX_S = 30
+
+def _queue_tenants_write() -> None:
+    # Caller must hold _TENANTS_LOCK
+    global _WRITER
+    _TENANTS_CACHE["gen"] += 1
+    _WRITE_QUEUE.put(None)
+    # Started on demand rather than at import: a forked worker (e.g. gunicorn
+    # --preload) inherits no running threads, so it gets its own writer here
+    if _WRITER is None or not _WRITER.is_alive():
+        _WRITER = Thread(target=_tenants_writer, name="tenants-writer", daemon=True)
+        _WRITER.start()
+
+def _flush_tenants() -> None:
+    """Write the cached tenant list to disk if it has changes not yet written"""
+    with _WRITE_LOCK:
+        with _TENANTS_LOCK:
+            gen = _TENANTS_CACHE["gen"]
+            if gen == _TENANTS_CACHE["written"]:
+                return
+            # The cached list is replaced, never mutated, so it can be dumped unlocked
+            tenants = _TENANTS_CACHE["list"]
+        tmp_file = _TENANTS_FILE.with_name(_TENANTS_FILE.name + ".tmp")
+        tmp_file.write_bytes(orjson.dumps(tenants, option=orjson.OPT_INDENT_2))
+        with _TENANTS_LOCK:
+            # Atomic swap, so readers never see a half-written file
+            os.replace(tmp_file, _TENANTS_FILE)
+            _TENANTS_CACHE["key"] = _stat_key()
+            _TENANTS_CACHE["written"] = gen
+
+def _tenants_writer() -> None:
+    delay = _WRITE_RETRY_S
+    while True:
+        _WRITE_QUEUE.get()
+        # Everything queued so far is covered by a single write of the latest list
+        while True:
+            try:
+                _WRITE_QUEUE.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            _flush_tenants()
+            delay = _WRITE_RETRY_S
+        except Exception:
+            # Memory stays authoritative; back off and queue a retry so the file
+            # catches up without waiting for the next change
+            app.logger.exception("Failed to write %s; retrying in %.1fs", _TENANTS_FILE, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, _WRITE_RETRY_MAX_S)
+            _WRITE_QUEUE.put(None)
+
+# The writer is a daemon thread, so flush anything still pending on shutdown
+atexit.register(_flush_tenants)
 
 # No hardcoded credentials - all tenant data comes from tenant management
 SCOPE = ["https://graph.microsoft.com/.default"]
 
+# Shared session so Graph and MSAL calls reuse keep-alive connections across
+# requests instead of opening (and TLS-handshaking) a new one per call.
+# Throttled (429) and unavailable (503) GETs are retried with a short backoff.
+# Retry-After is deliberately ignored: Graph can ask for minutes, and urllib3 would
+# sleep that long on the request thread regardless of the timeout.
+_GRAPH = requests.Session()
+_GRAPH.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 503],
+                      respect_retry_after_header=False, raise_on_status=False),
+))
+_GRAPH_TIMEOUT = 10
+
+class _MsalHttpClient:
+    """The shared session as MSAL's http_client, with _GRAPH_TIMEOUT as default timeout.
+
+    MSAL only applies its own timeout option to a session it creates itself.
+    """
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", _GRAPH_TIMEOUT)
+        return _GRAPH.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault("timeout", _GRAPH_TIMEOUT)
+        return _GRAPH.post(url, **kwargs)
+
+    def close(self):
+        # The session is shared across tenants; never close it on an app's behalf
+        pass
+
+_MSAL_HTTP = _MsalHttpClient()
+
+# Graph queries only $select the fields the dashboard uses; collections are paged
+# with $top=999 and followed through @odata.nextLink
+_USERS_URL = "https://graph.microsoft.com/v1.0/users?$select=id,displayName,userPrincipalName,accountEnabled&$top=999"
+_GROUPS_URL = "https://graph.microsoft.com/v1.0/groups?$select=id,displayName&$top=999"
+_SITES_URL = "https://graph.microsoft.com/v1.0/sites?search=*"
+_LICENSES_URL = "https://graph.microsoft.com/v1.0/subscribedSkus?$select=skuId,skuPartNumber,consumedUnits,prepaidUnits"
+
 @app.route('/api/token', methods=['GET'])
 def get_token():
     # This endpoint is deprecated - use tenant-specific endpoints instead
@@ -113,15 +319,7 @@ def get_metrics():
 
 @app.route('/api/tenants', methods=['GET'])
 def list_tenants():
-    tenants = _read_tenants()
-    # Do not return secrets; expose hasSecret flag
-    redacted = []
-    for t in tenants:
-        item = dict(t)
-        item.pop("clientSecret", None)
-        item["hasSecret"] = bool(t.get("clientSecret"))
-        redacted.append(item)
-    return jsonify({"tenants": redacted})
+    return jsonify({"tenants": _read_redacted_tenants()})
 
 @app.route('/api/tenants', methods=['POST'])
 def create_tenant():
@@ -146,10 +344,7 @@ def create_tenant():
         tenants.insert(0, new_item)
         _write_tenants(tenants)
         # return without secret
-        resp = dict(new_item)
-        resp.pop("clientSecret", None)
-        resp["hasSecret"] = True
-        return jsonify(resp), 201
+        return jsonify(_redact(new_item)), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -157,43 +352,47 @@ def create_tenant():
 def update_tenant(tenant_id):
     try:
         payload = request.get_json(force=True) or {}
-        tenants = _read_tenants()
+        tenants, index = _load_tenants()
+        idx = index.get(tenant_id)
         updated = None
-        for idx, t in enumerate(tenants):
-            if t.get('id') == tenant_id:
-                # Update base fields
-                t.update({
-                    "name": str(payload.get('name', t.get('name', ''))).strip(),
-                    "tenantId": str(payload.get('tenantId', t.get('tenantId', ''))).strip(),
-                    "clientId": str(payload.get('clientId', t.get('clientId', ''))).strip(),
-                    "isActive": bool(payload.get('isActive', t.get('isActive', True))),
-                    "lastSync": payload.get('lastSync', t.get('lastSync', '')),
-                    "userCount": int(payload.get('userCount', t.get('userCount', 0)) or 0),
-                    "licenseCount": int(payload.get('licenseCount', t.get('licenseCount', 0)) or 0),
-                })
-                # Update secret only if provided and non-empty
-                if 'clientSecret' in payload and str(payload['clientSecret']).strip():
-                    t['clientSecret'] = _encrypt_secret(str(payload['clientSecret']).strip())
-                updated = tenants[idx]
-                break
+        if idx is not None:
+            t = tenants[idx]
+            old_app_key = (t.get('tenantId', ''), t.get('clientId', ''))
+            # Update base fields
+            t.update({
+                "name": str(payload.get('name', t.get('name', ''))).strip(),
+                "tenantId": str(payload.get('tenantId', t.get('tenantId', ''))).strip(),
+                "clientId": str(payload.get('clientId', t.get('clientId', ''))).strip(),
+                "isActive": bool(payload.get('isActive', t.get('isActive', True))),
+                "lastSync": payload.get('lastSync', t.get('lastSync', '')),
+                "userCount": int(payload.get('userCount', t.get('userCount', 0)) or 0),
+                "licenseCount": int(payload.get('licenseCount', t.get('licenseCount', 0)) or 0),
+            })
+            # Update secret only if provided and non-empty
+            if 'clientSecret' in payload and str(payload['clientSecret']).strip():
+                t['clientSecret'] = _encrypt_secret(str(payload['clientSecret']).strip())
+            updated = t
         if not updated:
             return jsonify({"error": "Tenant not found"}), 404
         _write_tenants(tenants)
-        resp = dict(updated)
-        resp.pop("clientSecret", None)
-        resp["hasSecret"] = bool(updated.get("clientSecret"))
-        return jsonify(resp)
+        # Credentials or isActive may have changed
+        _invalidate_tenant_data(tenant_id)
+        _forget_tenant_secret(*old_app_key)
+        return jsonify(_redact(updated))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/tenants/<tenant_id>', methods=['DELETE'])
 def delete_tenant(tenant_id):
     try:
-        tenants = _read_tenants()
-        new_list = [t for t in tenants if t.get('id') != tenant_id]
-        if len(new_list) == len(tenants):
+        tenants, index = _load_tenants()
+        idx = index.get(tenant_id)
+        if idx is None:
             return jsonify({"error": "Tenant not found"}), 404
-        _write_tenants(new_list)
+        removed = tenants.pop(idx)
+        _write_tenants(tenants)
+        _invalidate_tenant_data(tenant_id)
+        _forget_tenant_secret(removed.get('tenantId', ''), removed.get('clientId', ''))
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -202,113 +401,194 @@ def delete_tenant(tenant_id):
 # Live Data Endpoints using Tenant Credentials
 # ----------------------
 
+@functools.lru_cache(maxsize=256)
+def _decrypt_cached(encrypted: str) -> str:
+    # Keyed by ciphertext, so a changed secret is simply a new entry; failures raise
+    # and are not cached
+    return _FERNET.decrypt(encrypted.encode("utf-8")).decode("utf-8")
+
 def _decrypt_secret(encrypted: str) -> str:
     """Decrypt a tenant secret"""
     if not encrypted or not _looks_encrypted(encrypted):
         return encrypted  # Return as-is if not encrypted
     try:
-        return _FERNET.decrypt(encrypted.encode("utf-8")).decode("utf-8")
+        return _decrypt_cached(encrypted)
     except (InvalidToken, Exception):
         return ""  # Return empty if decryption fails
 
+def _forget_tenant_secret(tenant_id_val: str, client_id: str) -> None:
+    """Drop the in-memory copies of a tenant's plaintext secret"""
+    # Both the decrypt cache and the tenant's MSAL app (with its token) hold it
+    _decrypt_cached.cache_clear()
+    _drop_msal_app(tenant_id_val, client_id)
+
 def _get_tenant_credentials(tenant_id: str) -> Tuple[str, str, str]:
     """Get decrypted credentials for a specific tenant"""
-    tenants = _read_tenants()
-    for t in tenants:
-        if t.get('id') == tenant_id and t.get('isActive', False):
-            return (
-                t.get('tenantId', ''),
-                t.get('clientId', ''),
-                _decrypt_secret(t.get('clientSecret', ''))
-            )
+    t = _get_tenant(tenant_id)
+    if t and t.get('isActive', False):
+        return (
+            t.get('tenantId', ''),
+            t.get('clientId', ''),
+            _decrypt_secret(t.get('clientSecret', ''))
+        )
     return ('', '', '')
 
-def _collect_tenant_data(tenant_id: str):
-    """Internal helper to collect tenant data; returns (payload_dict, status_code)."""
+# One MSAL app per (tenantId, clientId), so its in-memory token cache is reused
+# across requests instead of fetching a new token every call. The secret the app
+# was built with is stored next to it so a rotated secret replaces the entry.
+_MSAL_APPS: Dict[Tuple[str, str], Tuple[str, ConfidentialClientApplication]] = {}
+_MSAL_LOCK = Lock()
+
+def _get_msal_app(tenant_id_val: str, client_id: str, client_secret: str) -> ConfidentialClientApplication:
+    """Return the cached MSAL app for these credentials, creating it on first use"""
+    key = (tenant_id_val, client_id)
+    with _MSAL_LOCK:
+        entry = _MSAL_APPS.get(key)
+    if entry is not None and entry[0] == client_secret:
+        return entry[1]
+    # Built outside the lock: the constructor does authority discovery over the
+    # network, which must not stall token lookups for every other tenant
+    authority = f"https://login.microsoftonline.com/{tenant_id_val}"
+    app_msal = ConfidentialClientApplication(
+        client_id, authority=authority, client_credential=client_secret,
+        http_client=_MSAL_HTTP, timeout=_GRAPH_TIMEOUT
+    )
+    with _MSAL_LOCK:
+        entry = _MSAL_APPS.get(key)
+        # Another request may have built one for the same secret meanwhile; keep it
+        if entry is None or entry[0] != client_secret:
+            entry = _MSAL_APPS[key] = (client_secret, app_msal)
+        return entry[1]
+
+def _drop_msal_app(tenant_id_val: str, client_id: str) -> None:
+    """Forget a tenant's MSAL app along with its secret and cached token"""
+    with _MSAL_LOCK:
+        _MSAL_APPS.pop((tenant_id_val, client_id), None)
+
+# A sync that reports unchanged counts within this many seconds of the last one
+# does not rewrite tenants.json
+_SYNC_DEBOUNCE_S = 5
+
+def _iter_graph_values(url: str, headers: dict):
+    """Stream the rows of a Graph collection, following @odata.nextLink across pages.
+
+    Each page is parsed by ijson straight from the socket, so the raw body is never
+    held in memory; only one page of rows (at most $top) is built at a time.
+    """
+    while url:
+        next_url = None
+        with _GRAPH.get(url, headers=headers, stream=True, timeout=_GRAPH_TIMEOUT) as response:
+            response.raise_for_status()
+            # Let urllib3 undo any gzip Content-Encoding before the bytes reach ijson
+            response.raw.decode_content = True
+            # Top-level key/value pairs keep object building in ijson's C backend and
+            # find nextLink wherever it appears in the body
+            for key, value in ijson.kvitems(response.raw, "", use_float=True):
+                if key == "value":
+                    yield from value
+                elif key == "@odata.nextLink":
+                    next_url = value
+        url = next_url
+
+def _collect_tenant_data(tenant_id: str, include_rows: bool = True):
+    """Internal helper to collect tenant data; returns (payload_dict, status_code, tenant, failed).
+
+    tenant is the stored tenant record after its sync info was updated, or None on error.
+    failed names the Graph fetches that errored. If users or licenses failed the metrics
+    cannot be computed and a 502 error is returned; otherwise the payload lists them under
+    "failed" with their rows left empty. Either way the tenant's sync info is untouched.
+
+    With include_rows=False only the metrics are computed: groups and sites are not
+    fetched and the users/groups/sites/licenses lists in the payload are left empty.
+    """
     try:
         tenant_id_val, client_id, client_secret = _get_tenant_credentials(tenant_id)
 
         if not all([tenant_id_val, client_id, client_secret]):
-            return {"error": "Tenant not found or missing credentials"}, 404
+            return {"error": "Tenant not found or missing credentials"}, 404, None, []
 
-        # Create MSAL app for this specific tenant
-        authority = f"https://login.microsoftonline.com/{tenant_id_val}"
-        app_msal = ConfidentialClientApplication(
-            client_id, authority=authority, client_credential=client_secret
-        )
-
-        # Get token for this tenant
+        # Get token for this tenant; served from MSAL's cache until it expires
+        app_msal = _get_msal_app(tenant_id_val, client_id, client_secret)
         token = app_msal.acquire_token_for_client(scopes=SCOPE)
         if "access_token" not in token:
-            return {"error": "Failed to acquire token for tenant", "details": token}, 500
+            return {"error": "Failed to acquire token for tenant", "details": token}, 500, None, []
 
         headers = {"Authorization": f"Bearer {token['access_token']}"}
 
-        # Fetch all data in parallel
-        import concurrent.futures
-
+        # Fetch all data in parallel; each helper returns None if its fetch failed
         def fetch_users():
+            # Count users while streaming so the rows are only kept when needed
+            users, total, active = [], 0, 0
             try:
-                response = requests.get("https://graph.microsoft.com/v1.0/users", headers=headers)
-                response.raise_for_status()
-                return response.json()
+                for u in _iter_graph_values(_USERS_URL, headers):
+                    total += 1
+                    if u.get('accountEnabled', True):
+                        active += 1
+                    if include_rows:
+                        users.append(u)
             except Exception:
-                return {"value": []}
+                return None
+            return users, total, active
 
         def fetch_licenses():
             try:
-                response = requests.get("https://graph.microsoft.com/v1.0/subscribedSkus", headers=headers)
+                response = _GRAPH.get(_LICENSES_URL, headers=headers, timeout=_GRAPH_TIMEOUT)
                 response.raise_for_status()
-                return response.json()
+                return orjson.loads(response.content).get('value', [])
             except Exception:
-                return {"value": []}
+                return None
 
         def fetch_groups():
             try:
-                response = requests.get("https://graph.microsoft.com/v1.0/groups", headers=headers)
-                response.raise_for_status()
-                return response.json()
+                return list(_iter_graph_values(_GROUPS_URL, headers))
             except Exception:
-                return {"value": []}
+                return None
 
         def fetch_sites():
             try:
-                response = requests.get("https://graph.microsoft.com/v1.0/sites?search=*", headers=headers)
-                response.raise_for_status()
-                return response.json()
+                return list(_iter_graph_values(_SITES_URL, headers))
             except Exception:
-                return {"value": []}
+                return None
 
         with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
             future_users = executor.submit(fetch_users)
             future_licenses = executor.submit(fetch_licenses)
-            future_groups = executor.submit(fetch_groups)
-            future_sites = executor.submit(fetch_sites)
-
-            users_data = future_users.result()
-            licenses_data = future_licenses.result()
-            groups_data = future_groups.result()
-            sites_data = future_sites.result()
+            if include_rows:
+                future_groups = executor.submit(fetch_groups)
+                future_sites = executor.submit(fetch_sites)
+
+            results = {
+                "users": future_users.result(),
+                "licenses": future_licenses.result(),
+                "groups": future_groups.result() if include_rows else [],
+                "sites": future_sites.result() if include_rows else [],
+            }
 
-        users = users_data.get('value', [])
-        licenses = licenses_data.get('value', [])
-        groups = groups_data.get('value', [])
-        sites = sites_data.get('value', [])
+        failed = [name for name, result in results.items() if result is None]
+        if "users" in failed or "licenses" in failed:
+            # The metrics would be wrong; report the failure rather than zeros
+            return ({"error": "Failed to fetch tenant data from Microsoft Graph", "failed": failed},
+                    502, None, failed)
+        users, total_users, active_users = results["users"] or ([], 0, 0)
+        licenses = results["licenses"] or []
+        groups = results["groups"] or []
+        sites = results["sites"] or []
 
         # Calculate metrics
-        total_users = len(users)
-        active_users = len([u for u in users if u.get('accountEnabled', True)])
         disabled_users = total_users - active_users
 
-        total_licenses = sum(lic.get('prepaidUnits', {}).get('enabled', 0) for lic in licenses)
-        used_licenses = sum(lic.get('consumedUnits', 0) for lic in licenses)
+        # One pass over the SKUs for both totals
+        total_licenses = used_licenses = 0
+        for lic in licenses:
+            total_licenses += (lic.get('prepaidUnits') or {}).get('enabled', 0)
+            used_licenses += lic.get('consumedUnits', 0)
         available_licenses = total_licenses - used_licenses
 
         payload = {
             "users": users,
             "groups": groups,
             "sites": sites,
-            "licenses": licenses,
+            "licenses": licenses if include_rows else [],
             "metrics": {
                 "totalUsers": total_users,
                 "activeUsers": active_users,
@@ -327,55 +607,139 @@ def _collect_tenant_data(tenant_id: str):
             }
         }
 
-        # Update tenant sync info
-        tenants = _read_tenants()
-        for t in tenants:
-            if t.get('id') == tenant_id:
-                from datetime import datetime
-                t['lastSync'] = datetime.now().isoformat()
-                t['userCount'] = payload['metrics']['totalUsers']
-                t['licenseCount'] = payload['metrics']['totalLicenses']
-                break
-        _write_tenants(tenants)
-
-        return payload, 200
+        if failed:
+            payload["failed"] = failed
+
+        # Update tenant sync info, skipping the rewrite when the counts are unchanged
+        # and the previous sync was only moments ago. Counts from a partial fetch
+        # are not recorded.
+        tenants, index = _load_tenants()
+        idx = index.get(tenant_id)
+        tenant = tenants[idx] if idx is not None else None
+        if tenant is not None and not failed:
+            now = datetime.now()
+            changed = (tenant.get('userCount') != total_users
+                       or tenant.get('licenseCount') != total_licenses)
+            try:
+                recent = (now - datetime.fromisoformat(tenant.get('lastSync', ''))).total_seconds() < _SYNC_DEBOUNCE_S
+            except (TypeError, ValueError):
+                recent = False
+            if changed or not recent:
+                tenant['lastSync'] = now.isoformat()
+                tenant['userCount'] = total_users
+                tenant['licenseCount'] = total_licenses
+                _write_tenants(tenants)
+
+        return payload, 200, tenant, failed
     except Exception as e:
-        return {"error": str(e)}, 500
+        return {"error": str(e)}, 500, None, []
+
+def _json_response(payload, status: int = 200) -> Response:
+    """Serialize straight to bytes with orjson, bypassing Flask's JSON provider"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+# Serialized /data bodies per tenant as (monotonic timestamp, bytes, encoded variants).
+# Fresh entries are served as-is; stale ones are served while a background thread
+# refreshes them; past _DATA_STALE_S the data is collected again inline. The encoded
+# dict holds the body compressed per Content-Encoding, filled on first use, so cache
+# hits skip flask-compress.
+_DATA_FRESH_S = 30
+_DATA_STALE_S = 300
+_DATA_CACHE: Dict[str, Tuple[float, bytes, Dict[str, bytes]]] = {}
+_DATA_REFRESHING: set = set()
+# Bumped per tenant on invalidation so a collection that was already running when
+# the tenant changed does not store its now outdated result
+_DATA_GEN: Dict[str, int] = {}
+_DATA_LOCK = Lock()
+
+def _store_tenant_data(tenant_id: str) -> Tuple[bytes, int]:
+    """Collect and serialize a tenant's data, caching the body if it succeeded"""
+    with _DATA_LOCK:
+        gen = _DATA_GEN.get(tenant_id, 0)
+    payload, status, _, failed = _collect_tenant_data(tenant_id)
+    body = orjson.dumps(payload)
+    with _DATA_LOCK:
+        if status != 200:
+            # Stop serving a stale body for a tenant that can no longer be collected
+            _DATA_CACHE.pop(tenant_id, None)
+        # A partial result (e.g. a Graph outage) is returned but never cached; any
+        # earlier complete body keeps being served until it expires
+        elif not failed and _DATA_GEN.get(tenant_id, 0) == gen:
+            _DATA_CACHE[tenant_id] = (time.monotonic(), body, {})
+    return body, status
+
+def _refresh_tenant_data(tenant_id: str) -> None:
+    try:
+        _store_tenant_data(tenant_id)
+    finally:
+        with _DATA_LOCK:
+            _DATA_REFRESHING.discard(tenant_id)
+
+def _encode_body(body: bytes, algorithm: str) -> bytes:
+    # Same settings flask-compress would use for this algorithm
+    if algorithm == "br":
+        return brotli.compress(
+            body,
+            mode=app.config['COMPRESS_BR_MODE'],
+            quality=app.config['COMPRESS_BR_LEVEL'],
+            lgwin=app.config['COMPRESS_BR_WINDOW'],
+            lgblock=app.config['COMPRESS_BR_BLOCK'],
+        )
+    return gzip.compress(body, compresslevel=app.config['COMPRESS_LEVEL'])
+
+def _cached_data_response(body: bytes, encoded: Dict[str, bytes]) -> Response:
+    """Serve a cached /data body, compressed once per encoding and reused afterwards"""
+    algorithm = None
+    if len(body) >= app.config['COMPRESS_MIN_SIZE']:
+        algorithm = request.accept_encodings.best_match(app.config['COMPRESS_ALGORITHM'])
+    if algorithm is None:
+        return Response(body, mimetype='application/json')
+    data = encoded.get(algorithm)
+    if data is None:
+        # Racing first hits may both compress; either result is fine to keep
+        data = encoded[algorithm] = _encode_body(body, algorithm)
+    # Content-Encoding set here makes flask-compress leave the response alone
+    return Response(data, mimetype='application/json',
+                    headers={'Content-Encoding': algorithm, 'Vary': 'Accept-Encoding'})
+
+def _invalidate_tenant_data(tenant_id: str) -> None:
+    with _DATA_LOCK:
+        _DATA_CACHE.pop(tenant_id, None)
+        _DATA_GEN[tenant_id] = _DATA_GEN.get(tenant_id, 0) + 1
 
 @app.route('/api/tenants/<tenant_id>/data', methods=['GET'])
 def get_tenant_data(tenant_id):
     """Fetch live data from a specific tenant"""
-    payload, status = _collect_tenant_data(tenant_id)
-    return jsonify(payload), status
+    with _DATA_LOCK:
+        cached = _DATA_CACHE.get(tenant_id)
+        age = time.monotonic() - cached[0] if cached else None
+        refresh = (cached is not None and _DATA_FRESH_S <= age < _DATA_STALE_S
+                   and tenant_id not in _DATA_REFRESHING)
+        if refresh:
+            _DATA_REFRESHING.add(tenant_id)
+    if cached and age < _DATA_STALE_S:
+        if refresh:
+            Thread(target=_refresh_tenant_data, args=(tenant_id,), daemon=True).start()
+        return _cached_data_response(cached[1], cached[2])
+    body, status = _store_tenant_data(tenant_id)
+    return Response(body, status=status, mimetype='application/json')
 
 @app.route('/api/tenants/<tenant_id>/sync', methods=['POST'])
 def sync_tenant_data(tenant_id):
     """Sync and update tenant data"""
     try:
-        # Get live data for this tenant via helper
-        payload, status = _collect_tenant_data(tenant_id)
+        # Only the counts are stored on the tenant record, so skip the row lists
+        payload, status, updated_tenant, _ = _collect_tenant_data(tenant_id, include_rows=False)
         if status != 200:
-            return jsonify(payload), status
-
-        # Update the tenant record (already updated inside helper as well)
-        tenants = _read_tenants()
-        updated_tenant = None
-        for t in tenants:
-            if t.get('id') == tenant_id:
-                updated_tenant = dict(t)
-                break
+            return _json_response(payload, status)
 
         if not updated_tenant:
-            return jsonify({"error": "Tenant not found"}), 404
+            return _json_response({"error": "Tenant not found"}, 404)
 
         # Return updated tenant without secret
-        result = dict(updated_tenant)
-        result.pop("clientSecret", None)
-        result["hasSecret"] = bool(updated_tenant.get("clientSecret"))
-
-        return jsonify(result)
+        return _json_response(_redact(updated_tenant))
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _json_response({"error": str(e)}, 500)
 
 if __name__ == '__main__':
     print("Starting Flask backend on http://127.0.0.1:5000")
@@ -1,5 +1,7 @@
 import requests
 import logging
+import traceback
+import orjson
 import msal
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -48,7 +50,7 @@ def fetch_graph_data(endpoint: str, token: str, params: dict = None) -> dict:
     headers = {'Authorization': f'Bearer {token}'}
     response = requests.get(url, headers=headers, params=params)
     response.raise_for_status()
-    return response.json()
+    return orjson.loads(response.content)
 
 
 # Example: Fetch all users with selected fields (with paging)
@@ -59,7 +61,7 @@ def get_users(token):
     while url:
         res = requests.get(url, headers=headers)
         res.raise_for_status()
-        data = res.json()
+        data = orjson.loads(res.content)
         users.extend(data.get("value", []))
         url = data.get("@odata.nextLink", None)
     return users
@@ -84,7 +86,6 @@ def users_licenses():
             })
         return {"users": result}
     except Exception as e:
-        import traceback
         logging.error('Error in /api/users-licenses: %s', str(e))
         logging.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"{str(e)}\n{traceback.format_exc()}")
@@ -101,7 +102,6 @@ def graph_proxy(endpoint: str):
         data = fetch_graph_data(endpoint, token)
         return data
     except Exception as e:
-        import traceback
         logging.error('Error in /api/graph: %s', str(e))
         logging.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"{str(e)}\n{traceback.format_exc()}")